@@ -1,15 +1,19 @@
 import copy
 from pathlib import Path
-import re
 import sys
-import traceback
-from typing import Dict, List, Tuple
+from typing import AbstractSet, Dict, List, Optional, Tuple
 
 from mergedeep import merge, Strategy
 from jsonschema import Draft202012Validator
 import yaml
+try:
+    # Use the C-accelerated (libyaml) parser/emitter; ~5-10x faster than pure Python.
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper  # type: ignore
 
 from . import utils
+from . import utils_ast
 from .wic_types import Namespaces, Yaml, Tools, YamlTree, YamlForest, StepId, NodeData, RoseTree
 
 # NOTE: AST = Abstract Syntax Tree
@@ -24,7 +28,8 @@ def read_ast_from_disk(homedir: str,
                        yml_paths: Dict[str, Dict[str, Path]],
                        tools: Tools,
                        validator: Draft202012Validator,
-                       ignore_validation_errors: bool) -> YamlTree:
+                       ignore_validation_errors: bool,
+                       tools_stems: Optional[AbstractSet[str]] = None) -> YamlTree:
     """Reads the yml workflow definition files from disk (recursively) and inlines them into an AST
 
     Args:
@@ -34,6 +39,8 @@ def read_ast_from_disk(homedir: str,
         tools (Tools): The CWL CommandLineTool definitions found using get_tools_cwl()
         validator (Draft202012Validator): Used to validate the yml files against the autogenerated schema.
         ignore_validation_errors (bool): Temporarily ignore validation errors. Do not use this permanently!
+        tools_stems (Optional[AbstractSet[str]]): The stems of tools, precomputed once
+        and passed through the recursion. (tools is immutable within a compilation.)
 
     Raises:
         Exception: If the yml file(s) do not exist
@@ -42,45 +49,45 @@ def read_ast_from_disk(homedir: str,
         YamlTree: A tuple of the root filepath and the associated yml AST
     """
     (step_id, yaml_tree) = yaml_tree_tuple
+    if tools_stems is None:
+        tools_stems = frozenset(stepid.stem for stepid in tools)
 
     try:
         if not ignore_validation_errors:
-            validator.validate(yaml_tree)
+            tree_hash = hash(yaml.dump(yaml_tree, Dumper=SafeDumper, sort_keys=True))
+            if tree_hash not in utils_ast.known_valid_hashes:
+                validator.validate(yaml_tree)
+                if len(utils_ast.known_valid_hashes) < utils_ast.KNOWN_VALID_HASHES_MAX:
+                    utils_ast.known_valid_hashes.add(tree_hash)
     except Exception as e:
         yaml_path = Path(step_id.stem)
         print('Failed to validate', yaml_path)
         print(f'See validation_{yaml_path.stem}.txt for detailed technical information.')
         # Do not display a nasty stack trace to the user; hide it in a file.
         with open(f'validation_{yaml_path.stem}.txt', mode='w', encoding='utf-8') as f:
-            # https://mypy.readthedocs.io/en/stable/common_issues.html#python-version-and-system-platform-checks
-            if sys.version_info >= (3, 10):
-                traceback.print_exception(type(e), value=e, tb=None, file=f)
-            else:
-                traceback.print_exception(etype=type(e), value=e, tb=None, file=f)
+            utils_ast.print_exception(e, f)
         sys.exit(1)
 
     wic = {'wic': yaml_tree.get('wic', {})}
     if 'backends' in wic['wic']:
         # Recursively expand each backend, but do NOT choose a specific backend.
         # Require back_name to be .yml? For now, yes.
-        backends_trees = []
+        backends_trees: Dict[StepId, Yaml] = {}
         for back_name, back in wic['wic']['backends'].items():
             plugin_ns = wic['wic'].get('namespace', 'global')
             stepid = StepId(back_name, plugin_ns)
-            backends_tree = read_ast_from_disk(homedir, YamlTree(stepid, back), yml_paths, tools, validator,
-                                               ignore_validation_errors)
-            backends_trees.append(backends_tree)
-        yaml_tree['wic']['backends'] = dict(backends_trees)
+            (back_step_id, back_tree) = read_ast_from_disk(homedir, YamlTree(stepid, back), yml_paths, tools,
+                                                           validator, ignore_validation_errors, tools_stems)
+            backends_trees[back_step_id] = back_tree
+        yaml_tree['wic']['backends'] = backends_trees
         return YamlTree(step_id, yaml_tree)
 
-    steps: List[Yaml] = yaml_tree['steps']
     wic_steps = wic['wic'].get('steps', {})
-    steps_keys = utils.get_steps_keys(steps)
-    tools_stems = [stepid.stem for stepid in tools]
-    subkeys = utils.get_subkeys(steps_keys, tools_stems)
+    steps, steps_keys, subkeys = utils_ast.walk_steps(yaml_tree, tools_stems)
 
     for i, step_key in enumerate(steps_keys):
-        stem = Path(step_key).stem
+        stem = utils.stem(step_key)
+        step_key_label = f'({i+1}, {step_key})'
 
         # Recursively read subworkflows, adding yml file contents
         if step_key in subkeys:
@@ -90,7 +97,7 @@ def read_ast_from_disk(homedir: str,
             # It could (easily?) be done, but right now we have excellent
             # separation of concerns between simply reading yml files from disk
             # and then performing AST transformations in-memory.
-            sub_wic = wic_steps.get(f'({i+1}, {step_key})', {})
+            sub_wic = wic_steps.get(step_key_label, {})
             plugin_ns = sub_wic.get('wic', {}).get('namespace', 'global')
 
             paths_ns_i = yml_paths.get(plugin_ns, {})
@@ -109,12 +116,19 @@ def read_ast_from_disk(homedir: str,
                 raise Exception(f'Error! {yaml_path} does not exist or is not a .yml file.')
 
             # Load the high-level yaml sub workflow file.
-            with open(yaml_path, mode='r', encoding='utf-8') as y:
-                sub_yaml_tree_raw: Yaml = yaml.safe_load(y.read())
+            cache_key = (str(yaml_path), yaml_path.stat().st_mtime_ns)
+            if cache_key in utils_ast.yaml_parse_cache:
+                sub_yaml_tree_raw: Yaml = copy.deepcopy(utils_ast.yaml_parse_cache[cache_key])
+            else:
+                with open(yaml_path, mode='r', encoding='utf-8') as y:
+                    # Pass the file object directly so the parser streams the
+                    # file, avoiding one full-file-size transient str.
+                    sub_yaml_tree_raw = yaml.load(y, Loader=SafeLoader)
+                utils_ast.yaml_parse_cache[cache_key] = copy.deepcopy(sub_yaml_tree_raw)
 
             y_t = YamlTree(StepId(step_key, plugin_ns), sub_yaml_tree_raw)
             (step_id_, sub_yml_tree) = read_ast_from_disk(homedir, y_t, yml_paths, tools, validator,
-                                                          ignore_validation_errors)
+                                                          ignore_validation_errors, tools_stems)
 
             step_i_dict = {} if steps[i][step_key] is None else steps[i][step_key]
             # Do not merge these two dicts; use subtree and parentargs so we can
@@ -126,7 +140,8 @@ def read_ast_from_disk(homedir: str,
 
 def merge_yml_trees(yaml_tree_tuple: YamlTree,
                     wic_parent: Yaml,
-                    tools: Tools) -> YamlTree:
+                    tools: Tools,
+                    tools_stems: Optional[AbstractSet[str]] = None) -> YamlTree:
     """Implements 'parameter passing' by recursively merging wic: yml tags.
     Values from the parent workflow will overwrite / override subworkflows.
     See https://github.com/PolusAI/mm-workflows/blob/main/examples/gromacs/basic.yml for details
@@ -135,6 +150,8 @@ def merge_yml_trees(yaml_tree_tuple: YamlTree,
         yaml_tree_tuple (YamlTree): A tuple of a name and a yml AST
         wic_parent (Yaml): The wic: yml dict from the parent workflow
         tools (Tools): The CWL CommandLineTool definitions found using get_tools_cwl()
+        tools_stems (Optional[AbstractSet[str]]): The stems of tools, precomputed once
+        and passed through the recursion. (tools is immutable within a compilation.)
 
     Raises:
         Exception: If a wic: tag is found as an argument to a CWL CommandLineTool
@@ -143,10 +160,12 @@ def merge_yml_trees(yaml_tree_tuple: YamlTree,
         YamlTree: The yml AST with all wic: tags recursively merged.
     """
     (step_id, yaml_tree) = yaml_tree_tuple
+    if tools_stems is None:
+        tools_stems = frozenset(stepid.stem for stepid in tools)
 
     # Check for top-level yml dsl args
     wic_self = {'wic': yaml_tree.get('wic', {})}
-    wic = merge(wic_self, wic_parent, strategy=Strategy.TYPESAFE_REPLACE)
+    wic = utils_ast.merge_replace(wic_self, wic_parent)
     # Here we want to ADD wic: as a top-level yaml tag.
     # In the compilation phase, we want to remove it.
     yaml_tree['wic'] = wic['wic']
@@ -155,27 +174,25 @@ def merge_yml_trees(yaml_tree_tuple: YamlTree,
     if 'backends' in wic['wic']:
         # Recursively expand each backend, but do NOT choose a specific backend.
         # Require back_name to be .yml? For now, yes.
-        backends_trees = []
+        backends_trees: Dict[StepId, Yaml] = {}
         for stepid, back in wic['wic']['backends'].items():
-            backends_tree = merge_yml_trees(YamlTree(stepid, back), wic_parent, tools)
-            backends_trees.append(backends_tree)
-        yaml_tree['wic']['backends'] = dict(backends_trees)
+            (back_step_id, back_tree) = merge_yml_trees(YamlTree(stepid, back), wic_parent, tools, tools_stems)
+            backends_trees[back_step_id] = back_tree
+        yaml_tree['wic']['backends'] = backends_trees
         return YamlTree(step_id, yaml_tree)
 
-    steps: List[Yaml] = yaml_tree['steps']
-    steps_keys = utils.get_steps_keys(steps)
-    tools_stems = [stepid.stem for stepid in tools]
-    subkeys = utils.get_subkeys(steps_keys, tools_stems)
+    steps, steps_keys, subkeys = utils_ast.walk_steps(yaml_tree, tools_stems)
 
     for i, step_key in enumerate(steps_keys):
+        step_key_label = f'({i+1}, {step_key})'
         # Recursively merge subworkflows, to implement parameter passing.
         if step_key in subkeys:
             # Extract the sub yaml file that we pre-loaded from disk.
             sub_yml_tree_initial = steps[i][step_key]['subtree']
-            sub_wic = wic_steps.get(f'({i+1}, {step_key})', {})
+            sub_wic = wic_steps.get(step_key_label, {})
 
             y_t = YamlTree(StepId(step_key, step_id.plugin_ns), sub_yml_tree_initial)
-            (step_key_, sub_yml_tree) = merge_yml_trees(y_t, sub_wic, tools)
+            (step_key_, sub_yml_tree) = merge_yml_trees(y_t, sub_wic, tools, tools_stems)
             # Now mutably overwrite the self args with the merged args
             steps[i][step_key]['subtree'] = sub_yml_tree
 
@@ -184,51 +201,53 @@ def merge_yml_trees(yaml_tree_tuple: YamlTree,
         # (At this point, any DSL args provided from the parent(s) should have
         # all of the initial yml tags removed, leaving only CWL tags remaining.)
         if step_key not in subkeys:
-            clt_args = wic_steps.get(f'({i+1}, {step_key})', {})
+            clt_args = wic_steps.get(step_key_label, {})
             if 'wic' in clt_args:
                 # Do NOT add yml tags to the raw CWL!
                 # We can simply leave any step-specific wic: tags at top-level.
                 # Copy so we only delete from the step, not also the top-level.
-                clt_args = copy.deepcopy(clt_args)
-                del clt_args['wic']
+                # (A shallow copy suffices; we only remove a top-level key and
+                # the nested values are read-only downstream.)
+                clt_args = {key: val for key, val in clt_args.items() if key != 'wic'}
             sub_yml_tree = clt_args
             args_provided_dict_self = {}
             if steps[i][step_key]:
                 args_provided_dict_self = steps[i][step_key]
             # NOTE: To support overloading, the parent args must overwrite the child args!
-            args_provided_dict = merge(args_provided_dict_self, sub_yml_tree,
-                                       strategy=Strategy.TYPESAFE_REPLACE)  # TYPESAFE_ADDITIVE ?
+            args_provided_dict = utils_ast.merge_replace(args_provided_dict_self, sub_yml_tree)  # additive?
             # Now mutably overwrite the self args with the merged args
             steps[i][step_key] = args_provided_dict
 
     return YamlTree(step_id, yaml_tree)
 
 
-def tree_to_forest(yaml_tree_tuple: YamlTree, tools: Tools) -> YamlForest:
+def tree_to_forest(yaml_tree_tuple: YamlTree, tools: Tools,
+                   tools_stems: Optional[AbstractSet[str]] = None) -> YamlForest:
     """The purpose of this function is to abstract away the process of traversing an AST.
 
     Args:
         yaml_tree_tuple (YamlTree): A tuple of name and yml AST
         tools (Tools): The CWL CommandLineTool definitions found using get_tools_cwl()
+        tools_stems (Optional[AbstractSet[str]]): The stems of tools, precomputed once
+        and passed through the recursion. (tools is immutable within a compilation.)
 
     Returns:
         YamlForest: A recursive data structure containing all sub-trees encountered while traversing the yml AST.
     """
     (step_id, yaml_tree) = yaml_tree_tuple
+    if tools_stems is None:
+        tools_stems = frozenset(stepid.stem for stepid in tools)
 
     wic = {'wic': yaml_tree.get('wic', {})}
     if 'backends' in wic['wic']:
         backends_forest_list = []
         for stepid, back in wic['wic']['backends'].items():
-            backend_forest = (stepid, tree_to_forest(YamlTree(stepid, back), tools))
+            backend_forest = (stepid, tree_to_forest(YamlTree(stepid, back), tools, tools_stems))
             backends_forest_list.append(backend_forest)
         return YamlForest(YamlTree(step_id, yaml_tree), backends_forest_list)
 
-    steps: List[Yaml] = yaml_tree['steps']
     wic_steps = wic['wic'].get('steps', {})
-    steps_keys = utils.get_steps_keys(steps)
-    tools_stems = [stepid.stem for stepid in tools]
-    subkeys = utils.get_subkeys(steps_keys, tools_stems)
+    steps, steps_keys, subkeys = utils_ast.walk_steps(yaml_tree, tools_stems)
 
     yaml_forest_list = []
 
@@ -239,7 +258,7 @@ def tree_to_forest(yaml_tree_tuple: YamlTree, tools: Tools) -> YamlForest:
             plugin_ns_i = wic_step_i.get('wic', {}).get('namespace', 'global')
 
             sub_yaml_tree = steps[i][step_key]['subtree']
-            sub_yml_forest = tree_to_forest(YamlTree(StepId(step_key, plugin_ns_i), sub_yaml_tree), tools)
+            sub_yml_forest = tree_to_forest(YamlTree(StepId(step_key, plugin_ns_i), sub_yaml_tree), tools, tools_stems)
             (sub_yml_tree_step_id, sub_yml_tree_) = sub_yml_forest.yaml_tree
             yaml_forest_list.append((sub_yml_tree_step_id, sub_yml_forest))
 
@@ -249,7 +268,8 @@ def tree_to_forest(yaml_tree_tuple: YamlTree, tools: Tools) -> YamlForest:
 def get_inlineable_subworkflows(yaml_tree_tuple: YamlTree,
                                 tools: Tools,
                                 backend: bool = False,
-                                namespaces_init: Namespaces = []) -> List[Namespaces]:
+                                namespaces_init: Namespaces = [],
+                                tools_stems: Optional[AbstractSet[str]] = None) -> List[Namespaces]:
     """Traverses a yml AST and finds all subworkflows which can be inlined into their parent workflow.
 
     Args:
@@ -257,12 +277,16 @@ def get_inlineable_subworkflows(yaml_tree_tuple: YamlTree,
         tools (Tools): The CWL CommandLineTool definitions found using get_tools_cwl()
         backend (bool): True if the immediate parent workflow is a backend.
         namespaces_init (Namespaces): The initial subworkflow to start the traversal ([] == root)
+        tools_stems (Optional[AbstractSet[str]]): The stems of tools, precomputed once
+        and passed through the recursion. (tools is immutable within a compilation.)
 
     Returns:
         List[Namespaces]: The subworkflows which can be inlined into their parent workflows.
     """
     (step_id, yaml_tree) = yaml_tree_tuple
     yaml_name = step_id.stem
+    if tools_stems is None:
+        tools_stems = frozenset(stepid.stem for stepid in tools)
 
     # Check for top-level yml dsl args
     wic = {'wic': yaml_tree.get('wic', {})}
@@ -271,27 +295,26 @@ def get_inlineable_subworkflows(yaml_tree_tuple: YamlTree,
         # Use yaml_name (instead of back_name) and do not append to namespace_init.
         sub_namespaces_list = []
         for stepid, back in wic['wic']['backends'].items():
-            sub_namespaces = get_inlineable_subworkflows(YamlTree(stepid, back), tools, True, namespaces_init)
+            sub_namespaces = get_inlineable_subworkflows(YamlTree(stepid, back), tools, True,
+                                                         namespaces_init, tools_stems)
             sub_namespaces_list.append(sub_namespaces)
         return utils.flatten(sub_namespaces_list)
 
-    steps: List[Yaml] = yaml_tree['steps']
-    steps_keys = utils.get_steps_keys(steps)
-    tools_stems = [stepid.stem for stepid in tools]
-    subkeys = utils.get_subkeys(steps_keys, tools_stems)
+    steps, steps_keys, subkeys = utils_ast.walk_steps(yaml_tree, tools_stems)
 
     # All subworkflows are inlineable, except scattered subworkflows.
     inlineable = wic['wic'].get('inlineable', True)
     namespaces = [namespaces_init] if inlineable and namespaces_init != [] and not backend else []
 
+    yaml_stem = utils.stem(yaml_name)  # loop-invariant
     for i, step_key in enumerate(steps_keys):
-        yaml_stem = Path(yaml_name).stem
         step_name_i = utils.step_name_str(yaml_stem, i, step_key)
         if step_key in subkeys:
             sub_yml_tree = steps[i][step_key]['subtree']
 
             y_t = YamlTree(StepId(step_key, step_id.plugin_ns), sub_yml_tree)
-            sub_namespaces = get_inlineable_subworkflows(y_t, tools, False, namespaces_init + [step_name_i])
+            sub_namespaces = get_inlineable_subworkflows(y_t, tools, False,
+                                                         namespaces_init + [step_name_i], tools_stems)
             namespaces += sub_namespaces
 
     return namespaces
@@ -310,7 +333,15 @@ def inline_subworkflow(yaml_tree_tuple: YamlTree, namespaces: Namespaces) -> Tup
     if namespaces == []:
         return yaml_tree_tuple, 0
 
-    (step_id, yaml_tree) = copy.deepcopy(yaml_tree_tuple)
+    (step_id, yaml_tree) = yaml_tree_tuple
+    # Do NOT deepcopy the entire tree; copy only what this call actually mutates:
+    # the root dict, the steps list and the dicts along the namespaces path.
+    # All other subtrees are shared by reference with the caller's tree.
+    # (The wic: tag is mutated at arbitrary depth in inline_subworkflow_wic_tag,
+    # so deepcopy it; it is small compared to the steps data.)
+    yaml_tree = dict(yaml_tree)
+    if 'wic' in yaml_tree:
+        yaml_tree['wic'] = copy.deepcopy(yaml_tree['wic'])
     yaml_name = step_id.stem
 
     wic = {'wic': yaml_tree.get('wic', {})}
@@ -322,16 +353,17 @@ def inline_subworkflow(yaml_tree_tuple: YamlTree, namespaces: Namespaces) -> Tup
             return YamlTree(StepId(back_name_, step_id.plugin_ns), yaml_tree), 0  # len_substeps  # TODO: check step_id
 
         # Pass namespaces through unmodified
-        backends_trees = []
+        backends_trees: Dict[StepId, Yaml] = {}
         for stepid, back in wic['wic']['backends'].items():
-            backend_tree, len_substeps = inline_subworkflow(YamlTree(stepid, back), namespaces)
-            backends_trees.append(backend_tree)
-        yaml_tree['wic']['backends'] = dict(backends_trees)
+            (back_step_id, back_tree), len_substeps = inline_subworkflow(YamlTree(stepid, back), namespaces)
+            backends_trees[back_step_id] = back_tree
+        yaml_tree['wic']['backends'] = backends_trees
         return YamlTree(step_id, yaml_tree), 0  # choose len_substeps from which backend?
 
-    steps: List[Yaml] = yaml_tree['steps']
+    steps: List[Yaml] = list(yaml_tree['steps'])
+    yaml_tree['steps'] = steps
     steps_keys = utils.get_steps_keys(steps)
-    yaml_stem = Path(yaml_name).stem
+    yaml_stem = utils.stem(yaml_name)
     step_names = [utils.step_name_str(yaml_stem, i, step_key)
                   for i, step_key in enumerate(steps_keys)]
 
@@ -343,6 +375,8 @@ def inline_subworkflow(yaml_tree_tuple: YamlTree, namespaces: Namespaces) -> Tup
     # because due to overloading we may need to modify parent wic tags.
 
     (yaml_stem, i, step_key) = utils.parse_step_name_str(namespaces[0])
+    step_key_label = f'({i + 1}, {step_key})'
+    steps[i] = dict(steps[i])
     sub_yml_tree = steps[i][step_key]['subtree']
     sub_parentargs = steps[i][step_key]['parentargs']
 
@@ -350,6 +384,9 @@ def inline_subworkflow(yaml_tree_tuple: YamlTree, namespaces: Namespaces) -> Tup
     if len(namespaces) == 1:
         steps_inits = steps[:i]  # Exclude step i
         steps_tails = steps[i+1:]  # Exclude step i
+        # apply_args mutates the subworkflow (and its steps get spliced into our
+        # steps list), so this is the one branch which must deepcopy.
+        sub_yml_tree = copy.deepcopy(sub_yml_tree)
         # ~ syntax, specifically apply sub_parentargs to all inputs: call sites in sub_yml_tree
         sub_yml_tree = apply_args(sub_yml_tree, sub_parentargs)
         # Inline sub-steps.
@@ -359,21 +396,12 @@ def inline_subworkflow(yaml_tree_tuple: YamlTree, namespaces: Namespaces) -> Tup
         # subsequent steps in this workflow? No, except for wic: steps:
         len_substeps = len(sub_steps)
 
-        parent_wic_tag = wic.get('wic', {}).get("steps", {}).get(
-            f'({i + 1}, {step_key})', {}).get('wic', {})
+        parent_wic_tag = wic.get('wic', {}).get("steps", {}).get(step_key_label, {}).get('wic', {})
         sub_wic_tag = sub_yml_tree.get('wic', {})
 
-        # TODO: need cleaner code to make arbitrary-depth dictionary.
-        if 'wic' not in wic:
-            wic['wic'] = {}
-        if 'steps' not in wic['wic']:
-            wic['wic']['steps'] = {}
-        if f'({i + 1}, {step_key})' not in wic['wic']['steps']:
-            wic['wic']['steps'][f'({i + 1}, {step_key})'] = {}
-
         # Merge parent into child to support overloading.
         # TODO: Need to sort the steps by index
-        wic['wic']['steps'][f'({i + 1}, {step_key})']['wic'] = \
+        wic.setdefault('wic', {}).setdefault('steps', {}).setdefault(step_key_label, {})['wic'] = \
             merge(sub_wic_tag, parent_wic_tag, strategy=Strategy.TYPESAFE_REPLACE)
     else:
         # Strip off one initial namespace
@@ -402,22 +430,21 @@ def apply_args(sub_yml_tree: Yaml, sub_parentargs: Yaml) -> Yaml:
 
     steps = sub_yml_tree['steps']
     steps_keys = utils.get_steps_keys(steps)
+    parent_in = sub_parentargs.get('in', {})
 
     for argkey in inputs_workflow:
         # Ordinarily edge inference works across subworkflow boundaries (i.e. is inlineing invariant),
         # but with ~ syntax in the subworkflow and no explicit arguments in the parent workflow,
         # we cannot blindly inline the subworkflow and remove the ~'s in the subworkflow.
         # TODO: Consider adding wic metadata tags to cause inference to skip past the beginning of the subworkflow.
-        if argkey not in sub_parentargs.get('in', {}):
+        if argkey not in parent_in:
             print(f'Warning! Inlineing {argkey} with explicit inputs: in the subworkflow' +
                   'but edge inference in the parent workflow is not supported.')
 
-    for argkey, argval in sub_parentargs.get('in', {}).items():
-        # If we are attempting to apply a parameter given in the parent workflow,
-        # that parameter had better exist in the subworkflow!
-        if not argkey in inputs_workflow:
-            raise Exception(f'Error while inlineing {argkey}\n{yaml.dump(sub_yml_tree)}\n{yaml.dump(sub_parentargs)}')
-
+    # Build a reverse index of all ~ references in a single pass over the steps,
+    # instead of rescanning every step's inputs for every argkey.
+    tilde_refs: Dict[str, List[Tuple[Yaml, str]]] = {}
+    if parent_in:
         for i, step_key in enumerate(steps_keys):
             # NOTE: We should probably be using
             # sub_keys = utils.get_subkeys(steps_keys, tools)
@@ -429,9 +456,19 @@ def apply_args(sub_yml_tree: Yaml, sub_parentargs: Yaml) -> Yaml:
                 in_step = steps[i][step_key].get('parentargs', {}).get('in', {})
 
             for inputkey, inputval in in_step.items():
-                if inputval == '~' + argkey:
-                    # overwrite ~ syntax / apply argval
-                    in_step[inputkey] = argval
+                if isinstance(inputval, str) and inputval.startswith('~'):
+                    tilde_refs.setdefault(inputval[1:], []).append((in_step, inputkey))
+
+    for argkey, argval in parent_in.items():
+        # If we are attempting to apply a parameter given in the parent workflow,
+        # that parameter had better exist in the subworkflow!
+        if not argkey in inputs_workflow:
+            raise Exception(f'Error while inlineing {argkey}\n{yaml.dump(sub_yml_tree, Dumper=SafeDumper)}\n'
+                            + f'{yaml.dump(sub_parentargs, Dumper=SafeDumper)}')
+
+        # overwrite ~ syntax / apply argval
+        for in_step, inputkey in tilde_refs.get(argkey, []):
+            in_step[inputkey] = argval
 
     return sub_yml_tree
 
@@ -449,13 +486,19 @@ def inline_subworkflow_wic_tag(wic_tag: Yaml, namespaces: Namespaces, len_subste
     """
     tag_wic: Yaml = wic_tag['wic']
 
+    # If the current workflow carries no wic: steps: metadata at all, inlining
+    # is a no-op; bail out before building labels and walking the tag.
+    if not tag_wic.get('steps'):
+        return tag_wic
+
     # Note: the index after parsing is 0-based.
     step_ints_names = [utils.parse_step_name_str(ns)[1:] for ns in namespaces]
+    step_labels = [f'({index + 1}, {step_name})' for index, step_name in step_ints_names]
 
     sub_wic_parent = wic_tag  # initialize to the 'root' wic tag
     # Traverse down to the parent node of the subworkflow to the inlined
-    for index, step_name in step_ints_names[:-1]:
-        sub_wic_parent = sub_wic_parent.get('wic', {}).get('steps', {}).get(f'({index + 1}, {step_name})', {})
+    for step_label in step_labels[:-1]:
+        sub_wic_parent = sub_wic_parent.get('wic', {}).get('steps', {}).get(step_label, {})
         # Note: if any of the intermediate workflows in the path in the AST tree
         # from the current workflow to the subworkflow being inlined is absent in the current
         # wic metadata tag, the inlining won't have any effect on the wic tag of this workflow.
@@ -466,18 +509,20 @@ def inline_subworkflow_wic_tag(wic_tag: Yaml, namespaces: Namespaces, len_subste
 
     # Then get the wic tag of the subworkflow
     # Note: sub_index is 0-based.
-    sub_index, sub_step_name = step_ints_names[-1]
-    sub_wic = sub_wic_parent.get('wic', {}).get('steps', {}).get(f'({sub_index + 1}, {sub_step_name})', {})
+    sub_index = step_ints_names[-1][0]
+    sub_step_label = step_labels[-1]
+    sub_wic = sub_wic_parent.get('wic', {}).get('steps', {}).get(sub_step_label, {})
 
     # Note: we should not short circuit when the subworkflow being inlined is not used in the
     # current wic tag, since inlining it will affect the indices of sibling steps following it.
-    sub_wic_steps_reindexed = utils.reindex_wic_steps(sub_wic.get('wic', {}).get('steps', {}), 1, sub_index)
+    sub_wic_steps = sub_wic.get('wic', {}).get('steps', {})
+    sub_wic_steps_reindexed = utils.reindex_wic_steps(sub_wic_steps, 1, sub_index) if sub_wic_steps else {}
 
     # Delete the subworkflow from the parent workflow since it is replaced by its internal steps.
     # This needs to be explicitly done since the key of this subworkflow in the dict is not
     # the same as any of its inlined steps and therefore won't be overwritten by the deep merge.
-    if f'({sub_index + 1}, {sub_step_name})' in sub_wic_parent.get('wic', {}).get('steps', {}):
-        del sub_wic_parent['wic']['steps'][f'({sub_index + 1}, {sub_step_name})']
+    if sub_step_label in sub_wic_parent.get('wic', {}).get('steps', {}):
+        del sub_wic_parent['wic']['steps'][sub_step_label]
 
     # The inlining is actually a replacement of the target subworkflows by its steps.
     # Therefore, the incrementing count should be len_substeps - 1.
@@ -488,8 +533,11 @@ def inline_subworkflow_wic_tag(wic_tag: Yaml, namespaces: Namespaces, len_subste
     # Merge parent into child to support overloading.
     # TODO: The 'ranksame' in the wic tag of the inlined subworkflow is ignored
     # and not merged for now.
-    sub_wic_parent['wic']['steps'] = merge(sub_wic_steps_reindexed, sub_wic_parent_steps_reindexed,
-                                           strategy=Strategy.TYPESAFE_REPLACE)
+    if sub_wic_steps_reindexed:
+        sub_wic_parent['wic']['steps'] = merge(sub_wic_steps_reindexed, sub_wic_parent_steps_reindexed,
+                                               strategy=Strategy.TYPESAFE_REPLACE)
+    else:
+        sub_wic_parent['wic']['steps'] = sub_wic_parent_steps_reindexed
 
     return tag_wic
 
@@ -504,13 +552,13 @@ def move_slash_last(source_new: str) -> str:
     Returns:
         str: source_new with / moved to the last ___ position
     """
-    if '/' in source_new:
-        source_new = source_new.replace('/', '___')
-        source_split = source_new.split('___')
-        source_new = '___'.join(source_split[:-1]) + '/' + source_split[-1]
+    if '/' not in source_new:
         return source_new
-
-    return source_new
+    # NOTE: NOT simply rpartition('/'); the / must end up at the last ___
+    # position, which may be a pre-existing ___ after the last /.
+    source_new = source_new.replace('/', '___')
+    source_split = source_new.split('___')
+    return '___'.join(source_split[:-1]) + '/' + source_split[-1]
 
 
 def inline_subworkflow_cwl(rose_tree: RoseTree) -> RoseTree:
@@ -554,19 +602,22 @@ def inline_subworkflow_cwl(rose_tree: RoseTree) -> RoseTree:
             sub_cwl_tree = subkeysdict[step_key]
             sub_steps = sub_cwl_tree['steps']
             sub_steps_new = {}
+            prefix = f'{step_key}___'  # loop-invariant namespacing prefix
             for substepkey, substepval in sub_steps.items():
                 substep_inputs = substepval['in']
-                substep_inputs_new = {}
+                substep_inputs_new: Yaml = {}
+                # O(1) membership for the scatter tags appended below.
+                scatter_seen = set(substepval.get('scatter', ()))
                 for subinputkey, subinputval in substep_inputs.items():
                     # By default, copy the inputs and prepend namespace
                     if isinstance(subinputval, str):
                         source = move_slash_last(subinputval)
-                        substep_inputs_new[subinputkey] = step_key + '___' + subinputval
+                        substep_inputs_new[subinputkey] = prefix + subinputval
 
-                    if isinstance(subinputval, Dict):
+                    if isinstance(subinputval, dict):
                         source = subinputval['source']
                         source_new = move_slash_last(subinputval['source'])
-                        subinputval['source'] = step_key + '___' + source_new
+                        subinputval['source'] = prefix + source_new
                         substep_inputs_new[subinputkey] = subinputval
 
                     if source in inputs:
@@ -579,7 +630,7 @@ def inline_subworkflow_cwl(rose_tree: RoseTree) -> RoseTree:
                             # NOTE: Do not namespace; already namespaced in parent workflow.
                             newval = source_new  # step_key + '___' + source_new
 
-                        if isinstance(newval, Dict) and 'source' in newval:
+                        if isinstance(newval, dict) and 'source' in newval:
                             source_new = move_slash_last(newval['source'])
                             # NOTE: Do not namespace; already namespaced in parent workflow.
                             newval['source'] = source_new  # step_key + '___' + source_new
@@ -587,16 +638,16 @@ def inline_subworkflow_cwl(rose_tree: RoseTree) -> RoseTree:
                         substep_inputs_new[subinputkey] = newval  # Overwrite
                         # Copy any input variables referenced, i.e.
                         # initial scatter and/or slice for step 1
-                        m = re.match(r'.*\[inputs\.(.*)\].*', str(newval))
+                        newval_str = str(newval)
+                        # Cheap substring check; most edges don't use scatter/slice syntax.
+                        m = utils_ast.inputs_regex.search(newval_str) if '[inputs.' in newval_str else None
                         if m:
                             inputvarname = m.groups()[0]
                             if inputvarname:
                                 substep_inputs_new[inputvarname] = inputs[inputvarname]
                                 if inputvarname in scattervars:
-                                    if 'scatter' in substepval:
-                                        substepval['scatter'] += [inputvarname]
-                                    else:
-                                        substepval['scatter'] = [inputvarname]
+                                    substepval.setdefault('scatter', []).append(inputvarname)
+                                    scatter_seen.add(inputvarname)
 
                     # Distribute scatter unconditionally across ALL subworkflow dependencies
                     # i.e. https://en.wikipedia.org/wiki/Distributive_property
@@ -607,12 +658,10 @@ def inline_subworkflow_cwl(rose_tree: RoseTree) -> RoseTree:
 # but for now let's require the user to manually modify their yml.
                     if scattervars:
                         if ((isinstance(subinputval, str) and '/' in subinputval) or
-                                (isinstance(subinputval, Dict) and '/' in subinputval['source'])):
-                            if 'scatter' in substepval:
-                                if subinputkey not in substepval['scatter']:
-                                    substepval['scatter'] += [subinputkey]
-                            else:
-                                substepval['scatter'] = [subinputkey]
+                                (isinstance(subinputval, dict) and '/' in subinputval['source'])):
+                            if subinputkey not in scatter_seen:
+                                scatter_seen.add(subinputkey)
+                                substepval.setdefault('scatter', []).append(subinputkey)
                             substepval['scatterMethod'] = 'dotproduct'
 
                 # Overwrite inputs
@@ -620,12 +669,12 @@ def inline_subworkflow_cwl(rose_tree: RoseTree) -> RoseTree:
 
                 # Modify run tag
                 runstr = substepval['run']
-                if runstr.startswith('../'):
-                    substepval['run'] = runstr[len('../'):]
+                if runstr[:3] == '../':
+                    substepval['run'] = runstr[3:]
                 # TODO: Consider general case of prepending namespace / directory
 
                 # prepend namespace to step names
-                namespaced = step_key + '___' + substepkey
+                namespaced = prefix + substepkey
                 sub_steps_new[namespaced] = substepval
 
             sub_cwl_tree['steps'] = sub_steps_new
@@ -641,17 +690,14 @@ def inline_subworkflow_cwl(rose_tree: RoseTree) -> RoseTree:
 
     cwl_tree['steps'] = steps_new
 
-    # Finally, for all outputs in the parent workflow
+    # Finally, for all outputs in the parent workflow.
+    # Mutate in place; rebuilding the dict copies every key just to drop the
+    # (rare) output_all entries.
     outputs = cwl_tree['outputs']
-    outputs_new = {}
-    for outkey, outval in outputs.items():
-        if 'output_all' in outkey:
-            continue  # Skip for now.
-
+    for outkey in [outkey for outkey in outputs if 'output_all' in outkey]:
+        del outputs[outkey]  # Skip for now.
+    for outval in outputs.values():
         outval['outputSource'] = move_slash_last(outval['outputSource'])
-        outputs_new[outkey] = outval
-
-    cwl_tree['outputs'] = outputs_new
 
     data = NodeData(node_data.namespaces, node_data.name, node_data.yml, cwl_tree,  # NOTE: Only updating cwl_tree
                     node_data.workflow_inputs_file, node_data.explicit_edge_defs,
@@ -1,15 +1,58 @@
 import argparse
-import copy
-from pathlib import Path
-from typing import Dict, List
+import concurrent.futures
+import hashlib
+import json
+import threading
+from typing import Any, Dict
 
 import requests
 import yaml
+try:
+    # Use the C-accelerated (libyaml) parser/emitter; ~5-10x faster than pure Python.
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper  # type: ignore
+
+try:
+    # orjson serializes nested dict/str trees (i.e. compiled CWL) several
+    # times faster than the stdlib json used by requests' json= parameter.
+    import orjson
+
+    def _json_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def _canonical_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+except ImportError:
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+    def _canonical_dumps(obj: Any) -> bytes:
+        return json.dumps(obj, sort_keys=True).encode('utf-8')
 
 from . import __version__, utils
 from .wic_types import KV, Cwl, NodeData, RoseTree, StepId, Tools
 
 TIMEOUT = 60  # seconds
+MAX_UPLOAD_WORKERS = 8
+
+# Reuse keep-alive connections across all Compute requests, instead of paying
+# a new TCP+TLS handshake per upload.
+_session = requests.Session()
+_adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=32)
+_session.mount('http://', _adapter)
+_session.mount('https://', _adapter)
+
+# Memoize plugin uploads on the canonicalized tool content, so workflows which
+# use the same primitive CommandLineTool in multiple steps only POST it once.
+_plugin_cache: Dict[str, str] = {}
+_plugin_cache_lock = threading.Lock()
+
+# Likewise memoize subworkflow ("pipeline") uploads: in diamond-shaped DAGs the
+# same subworkflow is referenced from multiple parents, and re-walking it costs
+# O(paths) rather than O(unique nodes). The recursion itself is single-threaded
+# (only the leaf plugin uploads fan out), so no lock is needed here.
+_pipeline_cache: Dict[str, str] = {}
 
 
 def delete_previously_uploaded(args: argparse.Namespace, plugins_or_pipelines: str, name: str) -> None:
@@ -21,12 +64,28 @@ def delete_previously_uploaded(args: argparse.Namespace, plugins_or_pipelines: s
     """
     access_token = args.compute_access_token
 
-    response = requests.delete(args.compute_url + f'/compute/{plugins_or_pipelines}/' + name + ':' + __version__,
+    response = _session.delete(args.compute_url + f'/compute/{plugins_or_pipelines}/' + name + ':' + __version__,
                                headers={'Authorization': f'Bearer {access_token}'}, timeout=TIMEOUT)
     print('delete', response.json())
     # TODO: Check response for success
 
 
+def _remove_dot_dollar_str(string: str) -> str:
+    """Removes . and $ from $namespaces, $schemas, and .yml step names / references."""
+    return string.replace('$namespaces', 'namespaces').replace('$schemas', 'schemas').replace('.yml', '_yml')
+
+
+def _remove_dot_dollar_any(node: Any) -> Any:
+    """Recursively applies _remove_dot_dollar_str to all keys and string values."""
+    if isinstance(node, dict):
+        return {_remove_dot_dollar_str(key): _remove_dot_dollar_any(val) for key, val in node.items()}
+    if isinstance(node, list):
+        return [_remove_dot_dollar_any(val) for val in node]
+    if isinstance(node, str):
+        return _remove_dot_dollar_str(node)
+    return node
+
+
 def remove_dot_dollar(tree: Cwl) -> Cwl:
     """Removes . and $ from dictionary keys, e.g. $namespaces and $schemas. Otherwise, you will get
     {'error': {'statusCode': 500, 'message': 'Internal Server Error'}}
@@ -39,10 +98,11 @@ def remove_dot_dollar(tree: Cwl) -> Cwl:
     Returns:
         Cwl: A Cwl document with . and $ removed from $namespaces and $schemas
     """
-    tree_str = str(yaml.dump(tree, sort_keys=False, line_break='\n', indent=2))
-    tree_str_no_dd = tree_str.replace('$namespaces', 'namespaces').replace(
-        '$schemas', 'schemas').replace('.yml', '_yml')
-    tree_no_dd: Cwl = yaml.safe_load(tree_str_no_dd)  # This effectively copies tree
+    # NOTE: This used to be done with a yaml.dump / str.replace / yaml.load
+    # round-trip, i.e. a full serialize + parse of the tree per upload.
+    # The string values must also be rewritten so that run: / source:
+    # references stay consistent with the renamed step name keys.
+    tree_no_dd: Cwl = _remove_dot_dollar_any(tree)  # This effectively copies tree
     return tree_no_dd
 
 
@@ -59,11 +119,46 @@ def pretty_print_request(request: requests.PreparedRequest) -> None:
             body_str = body.decode('utf-8')
         else:
             body_str = body
-        print('request.body\n', yaml.dump(yaml.safe_load(body_str)))
+        print('request.body\n', yaml.dump(yaml.load(body_str, Loader=SafeLoader), Dumper=SafeDumper))
     else:
         print('request.body is None')
 
 
+def _post_json(url: str, access_token: str, payload: KV, name: str) -> str:
+    """POSTs a json payload to the Compute API and decodes the response once.
+
+    Args:
+        url (str): The full url of the Compute API endpoint
+        access_token (str): The access token used for authentication
+        payload (KV): The json payload to upload
+        name (str): The name of the uploaded object (used in error messages)
+
+    Raises:
+        Exception: If the upload failed for any reason
+
+    Returns:
+        str: The unique id of the uploaded object, or '-1' if already uploaded
+    """
+    response = _session.post(url, headers={'Authorization': f'Bearer {access_token}',
+                                           'Content-Type': 'application/json'},
+                             data=_json_dumps(payload), timeout=TIMEOUT)
+    r_json = response.json()
+
+    # {'error': {'statusCode': 422, 'name': 'UnprocessableEntityError',
+    # 'message': 'A Plugin with name ... and version ... already exists.'}}
+    if r_json.get('error', {}).get('statusCode', {}) == 422:
+        return '-1'
+
+    if 'id' not in r_json:
+        pretty_print_request(response.request)
+        print('post response')
+        print(r_json)
+        raise Exception(f'Error! Labshare upload failed for {name}.')
+
+    uploaded_id: str = r_json['id']  # hash
+    return uploaded_id
+
+
 def upload_plugin(compute_url: str, access_token: str, tool: Cwl, name: str) -> str:
     """Uploads CWL CommandLineTools to Polus Compute
 
@@ -81,6 +176,10 @@ def upload_plugin(compute_url: str, access_token: str, tool: Cwl, name: str) ->
     """
     # Convert the compiled yaml file to json for labshare Compute.
     tool_no_dd = remove_dot_dollar(tool)
+    cache_key = hashlib.blake2b(_canonical_dumps(tool_no_dd), digest_size=16).hexdigest()
+    with _plugin_cache_lock:
+        if cache_key in _plugin_cache:
+            return _plugin_cache[cache_key]
     compute_plugin: KV = {
         'name': name,
         # TODO: Using the WIC version works for now, but since the plugins
@@ -91,26 +190,9 @@ def upload_plugin(compute_url: str, access_token: str, tool: Cwl, name: str) ->
     }
 
     # Use http POST request to upload a primitive CommandLineTool / define a plugin and get its id hash.
-    response = requests.post(compute_url + '/compute/plugins',
-                             headers={'Authorization': f'Bearer {access_token}'},
-                             json=compute_plugin, timeout=TIMEOUT)
-    r_json = response.json()
-
-    # {'error': {'statusCode': 422, 'name': 'UnprocessableEntityError',
-    # 'message': 'A Plugin with name ... and version ... already exists.'}}
-    already_uploaded = r_json.get('error', {}).get('statusCode', {}) == 422
-    if already_uploaded:
-        return '-1'
-
-    if 'id' not in r_json:
-        pretty_print_request(response.request)
-        print('post response')
-        print(r_json)
-        raise Exception(f'Error! Labshare plugin upload failed for {name}.')
-
-    plugin_id: str = r_json['id']  # hash
-    compute_plugin['id'] = plugin_id
-    compute_plugin.update({'id': plugin_id})  # Necessary ?
+    plugin_id = _post_json(compute_url + '/compute/plugins', access_token, compute_plugin, name)
+    with _plugin_cache_lock:
+        _plugin_cache[cache_key] = plugin_id
     return plugin_id
 
 
@@ -120,11 +202,12 @@ def print_plugins(compute_url: str) -> None:
     Args:
         compute_url (str): The url to the Compute API
     """
-    r = requests.get(compute_url + '/compute/plugins/', timeout=TIMEOUT)
-    for j in r.json():
+    r = _session.get(compute_url + '/compute/plugins/', timeout=TIMEOUT)
+    plugins = r.json()  # Parse the response body once.
+    for j in plugins:
         print(f"id {j.get('id')} class {j.get('class')} name {j.get('name')}")
         # print(j)
-    print(len(r.json()))
+    print(len(plugins))
 
 
 def upload_all(rose_tree: RoseTree, tools: Tools, args: argparse.Namespace, is_root: bool) -> str:
@@ -151,18 +234,20 @@ def upload_all(rose_tree: RoseTree, tools: Tools, args: argparse.Namespace, is_r
     cwl_tree = sub_node_data.compiled_cwl
     yaml_inputs = sub_node_data.workflow_inputs_file
 
+    # Memoize subworkflow uploads on their content, so a subworkflow referenced
+    # from multiple parents is walked and POSTed only once. The root workflow
+    # is uploaded exactly once anyway (and its payload includes the job inputs).
+    cache_key = ''
+    if not is_root:
+        cache_key = hashlib.blake2b(_canonical_dumps([cwl_tree, yaml_inputs]), digest_size=16).hexdigest()
+        if cache_key in _pipeline_cache:
+            return _pipeline_cache[cache_key]
+
     sub_rose_trees: Dict[str, RoseTree] = {r.data.name: r for r in rose_tree.sub_trees}
     # print(list(sub_rose_trees))
 
     steps = cwl_tree['steps']
 
-    # Get the dictionary key (i.e. the name) of each step.
-    steps_keys: List[str] = []
-    for step in steps:
-        step_key = utils.parse_step_name_str(step)[-1]
-        steps_keys.append(step_key)
-    # print(steps_keys)
-
     # tools_stems = [stepid.stem for stepid in tools]
     # subkeys = utils.get_subkeys(steps_keys, tools_stems)
 
@@ -174,11 +259,19 @@ def upload_all(rose_tree: RoseTree, tools: Tools, args: argparse.Namespace, is_r
 
     # Convert the compiled yaml file to json for labshare Compute.
     # Replace 'run' with plugin:id
-    cwl_tree_run = copy.deepcopy(cwl_tree_no_dd)
-    for i, step_key in enumerate(steps_keys):
+    # Only steps[*]['run'] is overwritten below, so shallow copies of the root
+    # dict and each step dict suffice; do NOT deepcopy the entire tree.
+    cwl_tree_run = dict(cwl_tree_no_dd)
+    cwl_tree_run['steps'] = {key: dict(val) for key, val in cwl_tree_no_dd['steps'].items()}
+    # Pass 1: recursively upload subworkflows (sequentially, since they recurse)
+    # and collect the primitive tool uploads, which are independent of each other.
+    tool_uploads: Dict[str, Cwl] = {}  # Also dedupes steps which reuse the same tool.
+    for i, step in enumerate(steps):
+        # Get the dictionary key (i.e. the name) of each step.
+        step_key = utils.parse_step_name_str(step)[-1]
         sub_wic = wic_steps.get(f'({i+1}, {step_key})', {})
         plugin_ns_i = sub_wic.get('wic', {}).get('namespace', 'global')
-        stem = Path(step_key).stem
+        stem = utils.stem(step_key)
 
         # if step_key in subkeys: # and not is_root, but the former implies the latter
         # plugin_id = upload_plugin(args.compute_url, access_token, cwl_tree_run, yaml_stem)
@@ -190,13 +283,21 @@ def upload_all(rose_tree: RoseTree, tools: Tools, args: argparse.Namespace, is_r
             # a 'primitive' Workflow that we did NOT recursively generate.
             # delete_previously_uploaded(args, 'plugins', stem)
             step_id = StepId(stem, plugin_ns_i)
-            tool_i = tools[step_id].cwl
-            plugin_id = upload_plugin(args.compute_url, access_token, tool_i, stem)
+            tool_uploads[stem] = tools[step_id].cwl
             run_val = f'plugin:{stem}:{__version__}'
         step_name_i = utils.step_name_str(yaml_stem, i, step_key)
         step_name_i = step_name_i.replace('.yml', '_yml')  # Due to calling remove_dot_dollar above
         cwl_tree_run['steps'][step_name_i]['run'] = run_val
 
+    # Pass 2: dispatch the independent plugin uploads concurrently over the
+    # pooled session, so network latency does not stack linearly with step count.
+    if tool_uploads:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_UPLOAD_WORKERS) as executor:
+            futures = [executor.submit(upload_plugin, args.compute_url, access_token, tool_i, stem)
+                       for stem, tool_i in tool_uploads.items()]
+            for future in futures:
+                future.result()  # Re-raise any upload failure.
+
     workflow_id: str = ''
     if is_root:
         compute_workflow = {
@@ -207,18 +308,10 @@ def upload_all(rose_tree: RoseTree, tools: Tools, args: argparse.Namespace, is_r
             **cwl_tree_run
         }
         # Use http POST request to upload a complete Workflow (w/ inputs) and get its id hash.
-        response = requests.post(args.compute_url + '/compute/workflows',
-                                 headers={'Authorization': f'Bearer {access_token}'},
-                                 json=compute_workflow, timeout=TIMEOUT)
-        r_json = response.json()
-        print('post response')
-        j = r_json
-        print(f"id {j.get('id')} class {j.get('class')} name {j.get('name')}")
-        if 'id' not in r_json:
-            pretty_print_request(response.request)
-            print(r_json)
+        workflow_id = _post_json(args.compute_url + '/compute/workflows', access_token, compute_workflow, yaml_stem)
+        if workflow_id == '-1':
             raise Exception(f'Error! Labshare workflow upload failed for {yaml_stem}.')
-        workflow_id = r_json['id']  # hash
+        print('workflow id', workflow_id)
     else:
         #  "owner": "string",
         #  "additionalProp1": {}
@@ -238,26 +331,12 @@ def upload_all(rose_tree: RoseTree, tools: Tools, args: argparse.Namespace, is_r
 
         # delete_previously_uploaded(args, 'pipelines', yaml_stem)
         # Use http POST request to upload a subworkflow / "pipeline" (no inputs) and get its id hash.
-        response = requests.post(args.compute_url + '/compute/pipelines',
-                                 headers={'Authorization': f'Bearer {access_token}'},
-                                 json=compute_pipeline, timeout=TIMEOUT)
-        r_json = response.json()
-
-        # {'error': {'statusCode': 422, 'name': 'UnprocessableEntityError',
-        # 'message': 'A Plugin with name ... and version ... already exists.'}}
-        already_uploaded = r_json.get('error', {}).get('statusCode', {}) == 422
-        if already_uploaded:
-            return '-1'
-
-        print('post response')
-        j = r_json
-        print(f"id {j.get('id')} class {j.get('class')} name {j.get('name')}")
-        if 'id' not in r_json:
-            pretty_print_request(response.request)
-            print(r_json)
-            raise Exception(f'Error! Labshare workflow upload failed for {yaml_stem}.')
-        workflow_id = r_json['id']  # hash
+        # NOTE: No per-pipeline success print; stdout writes in the upload loop
+        # slow down wall-clock time meaningfully for large workflows.
+        workflow_id = _post_json(args.compute_url + '/compute/pipelines', access_token, compute_pipeline, yaml_stem)
     # if is_root:
     #    print_plugins(args.compute_url)
 
+    if not is_root:
+        _pipeline_cache[cache_key] = workflow_id
     return workflow_id
@@ -3,7 +3,7 @@ import copy
 import json
 from pathlib import Path
 import subprocess as sub
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Collection, Dict, List, Optional, Tuple
 
 import yaml
 
@@ -172,20 +172,19 @@ def get_steps_keys(steps: List[Yaml]) -> List[str]:
         List[str]: The name of each step in the given CWL workflow
     """
     # Get the dictionary key (i.e. the name) of each step.
-    steps_keys = []
-    for step in steps:
-        steps_keys += list(step)
+    steps_keys = [key for step in steps for key in step]
     # print(steps_keys)
     return steps_keys
 
 
-def get_subkeys(steps_keys: List[str], tools_stems: List[str]) -> List[str]:
+def get_subkeys(steps_keys: List[str], tools_stems: Collection[str]) -> List[str]:
     """This function determines which step keys are associated with subworkflows.\n
     This is critical for the control flow in many areas of the compiler.
 
     Args:
         steps_keys (List[str]): All of the step keys for the current workflow.
-        tools_stems (List[str]): All of the step keys associated with CommandLineTools.
+        tools_stems (Collection[str]): All of the step keys associated with CommandLineTools.
+        (Pass a set / frozenset for O(1) membership tests.)
 
     Returns:
         List[str]: The list of step keys associated with subworkflows of the current workflow.
@@ -194,6 +193,21 @@ def get_subkeys(steps_keys: List[str], tools_stems: List[str]) -> List[str]:
     return [key for key in steps_keys if (key not in tools_stems) and (key not in exceptions)]
 
 
+def stem(key: str) -> str:
+    """Fast equivalent of Path(key).stem for plain step keys.
+    pathlib.Path construction is surprisingly heavy for the per-step loops.
+
+    Args:
+        key (str): A step key, i.e. a filename such as sub.yml
+
+    Returns:
+        str: The filename without its extension
+    """
+    base = key.rsplit('/', 1)[-1]
+    dot = base.rfind('.')
+    return base if dot <= 0 else base[:dot]
+
+
 def extract_backend(yaml_tree: Yaml, wic: Yaml, yaml_path: Path) -> Tuple[str, Yaml]:
     """Chooses a specific backend for a given CWL workflow step.
 
@@ -0,0 +1,87 @@
+import re
+import sys
+import traceback
+from typing import AbstractSet, Dict, List, Set, TextIO, Tuple
+
+from . import utils
+from .wic_types import Yaml
+
+# Many real workflows reference the same subworkflow from multiple parents, so
+# cache the parsed file contents keyed on (filepath, modification time).
+# Since the callers mutate the returned trees in-place, we store a pristine
+# copy and return a fresh deepcopy on every cache hit.
+yaml_parse_cache: Dict[Tuple[str, int], Yaml] = {}
+
+# https://mypy.readthedocs.io/en/stable/common_issues.html#python-version-and-system-platform-checks
+# Choose the right traceback.print_exception signature once at import time.
+if sys.version_info >= (3, 10):
+    def print_exception(e: BaseException, f: TextIO) -> None:
+        traceback.print_exception(type(e), value=e, tb=None, file=f)
+else:
+    def print_exception(e: BaseException, f: TextIO) -> None:
+        traceback.print_exception(etype=type(e), value=e, tb=None, file=f)
+
+# jsonschema validation is expensive and subworkflows are validated once per
+# parent that references them. Since validation either raises or returns None,
+# a bounded set of known-good tree hashes is all we need.
+known_valid_hashes: Set[int] = set()
+KNOWN_VALID_HASHES_MAX = 4096
+
+# Matches input variables referenced in scatter and/or slice expressions, i.e. [inputs.input_names]
+# Compiled once; re.match with a string pattern pays a cache lookup per call.
+inputs_regex = re.compile(r'\[inputs\.([^\]]*)\]')
+
+
+def walk_steps(yaml_tree: Yaml, tools_stems: AbstractSet[str]) -> Tuple[List[Yaml], List[str], List[str]]:
+    """Computes the per-node traversal data shared by all of the recursive AST passes.
+
+    read_ast_from_disk, merge_yml_trees, tree_to_forest and
+    get_inlineable_subworkflows all perform this same prelude at every node;
+    doing it in one place keeps the walkers in sync.
+
+    Args:
+        yaml_tree (Yaml): A yml AST node with a steps: tag
+        tools_stems (AbstractSet[str]): The stems of tools, precomputed once per compilation.
+
+    Returns:
+        Tuple[List[Yaml], List[str], List[str]]: steps, their keys, and the subworkflow keys
+    """
+    steps: List[Yaml] = yaml_tree['steps']
+    steps_keys = utils.get_steps_keys(steps)
+    subkeys = utils.get_subkeys(steps_keys, tools_stems)
+    return steps, steps_keys, subkeys
+
+
+def merge_replace(dst: Yaml, src: Yaml) -> Yaml:
+    """Recursively merges src into dst, overwriting values in dst.
+
+    This is a specialized version of mergedeep.merge(dst, src, strategy=Strategy.TYPESAFE_REPLACE).
+    mergedeep is a generic routine which traverses and type-checks every node;
+    since the wic: tags only ever merge nested dicts of yml scalars/lists,
+    a hand-rolled dict-overwrite is significantly cheaper in the hot path.
+
+    Args:
+        dst (Yaml): The destination dict, mutably updated.
+        src (Yaml): The source dict. Values from src will overwrite values in dst.
+
+    Raises:
+        TypeError: If the destination and source types differ (like Strategy.TYPESAFE).
+
+    Returns:
+        Yaml: dst, after merging src into it.
+    """
+    for key, srcval in src.items():
+        if key in dst:
+            dstval = dst[key]
+            if isinstance(dstval, dict) and isinstance(srcval, dict):
+                merge_replace(dstval, srcval)
+            elif dstval is srcval:
+                pass
+            elif type(dstval) is not type(srcval):
+                raise TypeError(
+                    f'destination type: {type(dstval)} differs from source type: {type(srcval)} for key: "{key}"')
+            else:
+                dst[key] = srcval
+        else:
+            dst[key] = srcval
+    return dst
@@ -52,6 +52,9 @@ DiGraph = Any  # graphviz.DiGraph
 
 class GraphData():
     # pylint:disable=too-few-public-methods
+    # One instance per workflow node; __slots__ avoids a per-instance __dict__.
+    __slots__ = ('name', 'nodes', 'edges', 'subgraphs', 'ranksame')
+
     def __init__(self,
                  name: str,  # TODO: Should this be StepId?
                  nodes: List[Tuple[str, Dict]] = [],